@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import os
+import json
+import logging
+import threading
+import subprocess
+
+HASH_INDEX_FILE = os.path.join(os.path.expanduser("~"), ".yttrimmer_hashes.json")
+# Frames are sampled at these fractions of the duration, away from intros and end cards
+SAMPLE_POSITIONS = (0.1, 0.3, 0.5, 0.7, 0.9)
+# Average differing bits per 64-bit frame hash for two videos to count as duplicates
+MAX_FRAME_DISTANCE = 10
+
+
+def frame_dhash(path, seconds):
+    """64-bit difference hash of the frame at `seconds`, computed from a 9x8 grayscale FFmpeg scale."""
+    cmd = [
+        "ffmpeg",
+        "-v", "error",
+        "-ss", f"{seconds:.3f}",
+        "-i", path,
+        "-frames:v", "1",
+        "-vf", "scale=9:8,format=gray",
+        "-f", "rawvideo",
+        "-"
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        logging.error(f"Failed to sample frame of {path} at {seconds:.1f}s", exc_info=True)
+        return None
+    pixels = result.stdout
+    if result.returncode != 0 or len(pixels) < 72:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left < right)
+    return bits
+
+def video_signature(path, duration):
+    """Frame hashes at SAMPLE_POSITIONS, or None if the video could not be sampled."""
+    if not duration:
+        return None
+    hashes = []
+    for position in SAMPLE_POSITIONS:
+        frame_hash = frame_dhash(path, duration * position)
+        if frame_hash is None:
+            return None
+        hashes.append(frame_hash)
+    return hashes
+
+def pack_signature(hashes):
+    # One integer per video lets a single XOR + popcount compare every frame at once
+    packed = 0
+    for frame_hash in hashes:
+        packed = (packed << 64) | frame_hash
+    return packed
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+def durations_match(a, b):
+    return abs(a - b) <= max(2.0, 0.02 * max(a, b))
+
+
+class HashIndex:
+    """Persistent store of video signatures, valid while a file's size and mtime are unchanged.
+
+    Also remembers which YouTube video IDs were downloaded to which files.
+    """
+
+    def __init__(self, path=HASH_INDEX_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.videos = {}
+        self.video_ids = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.videos = data.get("videos", {})
+            self.video_ids = data.get("video_ids", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError):
+            logging.error(f"Hash index {path} is unreadable, starting empty.", exc_info=True)
+
+    def save(self):
+        with self.lock:
+            data = {"videos": self.videos, "video_ids": self.video_ids}
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                logging.error(f"Failed to save hash index {self.path}", exc_info=True)
+
+    def get(self, item):
+        with self.lock:
+            entry = self.videos.get(item["path"])
+        if entry and entry["size"] == item["size"] and entry["mtime"] == item["mtime"]:
+            return [int(h, 16) for h in entry["hashes"]]
+        return None
+
+    def put(self, item, hashes):
+        with self.lock:
+            self.videos[item["path"]] = {"size": item["size"], "mtime": item["mtime"],
+                                         "hashes": [f"{h:016x}" for h in hashes]}
+
+    def record_video_id(self, video_id, path):
+        path = os.path.abspath(path)
+        with self.lock:
+            paths = self.video_ids.setdefault(video_id, [])
+            if path not in paths:
+                paths.append(path)
+        self.save()
+
+    def remove(self, paths):
+        """Forget deleted files: their signatures and any video IDs pointing at them."""
+        paths = {os.path.abspath(path) for path in paths}
+        with self.lock:
+            for path in paths:
+                self.videos.pop(path, None)
+            for video_id in list(self.video_ids):
+                remaining = [path for path in self.video_ids[video_id] if path not in paths]
+                if remaining:
+                    self.video_ids[video_id] = remaining
+                else:
+                    del self.video_ids[video_id]
+        self.save()
+
+    def paths_for_video_id(self, video_id):
+        with self.lock:
+            paths = list(self.video_ids.get(video_id, []))
+        return [path for path in paths if os.path.exists(path)]
+
+
+def find_duplicates(items, index, executor=None, max_frame_distance=MAX_FRAME_DISTANCE):
+    """Group library items (dicts from library.LibraryScanner) whose sampled frames nearly match.
+
+    Missing signatures are computed on `executor` and stored in `index`. Returns a list
+    of groups, each a list of two or more items, largest files first.
+    """
+    items = [item for item in items if item["duration"]]
+    missing = [item for item in items if index.get(item) is None]
+    if missing:
+        logging.debug(f"Hashing {len(missing)} videos for duplicate detection.")
+        mapper = executor.map if executor else map
+        for item, hashes in zip(missing, mapper(lambda i: video_signature(i["path"], i["duration"]), missing)):
+            if hashes:
+                index.put(item, hashes)
+        index.save()
+
+    signed = []
+    for item in items:
+        hashes = index.get(item)
+        if hashes and len(hashes) == len(SAMPLE_POSITIONS):
+            signed.append((item, pack_signature(hashes)))
+    radius = max_frame_distance * len(SAMPLE_POSITIONS)
+
+    parent = list(range(len(signed)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Sorted by duration, so each video only needs comparing with the ones just after it.
+    # A BK-tree does not help here: a 50-bit radius over 320-bit keys prunes almost nothing.
+    signed.sort(key=lambda pair: pair[0]["duration"])
+    for i, (item, signature) in enumerate(signed):
+        for j in range(i + 1, len(signed)):
+            other, other_signature = signed[j]
+            if not durations_match(item["duration"], other["duration"]):
+                break
+            if hamming(signature, other_signature) <= radius:
+                parent[find(j)] = find(i)
+
+    groups = {}
+    for i, (item, _) in enumerate(signed):
+        groups.setdefault(find(i), []).append(item)
+    duplicates = [sorted(group, key=lambda item: -item["size"]) for group in groups.values() if len(group) > 1]
+    duplicates.sort(key=lambda group: -sum(item["size"] for item in group[1:]))
+    logging.debug(f"Found {len(duplicates)} duplicate groups among {len(signed)} hashed videos.")
+    return duplicates
@@ -1,20 +1,54 @@
 #!/usr/bin/env python3
+import time
+STARTUP_T0 = time.perf_counter()
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from PIL import Image, ImageTk, ImageDraw
-import requests
 import io
-import subprocess
+import bisect
+import queue
 import threading
 import os
 import re
 import logging
+from jobs import (JobJournal, Job, JobCancelled, run_job, cleanup_job_files,
+                  sanitize_filename, clip_filename, format_time)
+from probe import ToolProbe
+from library import (LibraryScanner, load_library_roots, save_library_roots,
+                     parse_query, matches_query, format_size)
+from dedupe import HashIndex, find_duplicates
+# PIL and requests are imported where they are first used to keep startup fast
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Time from launch until the window is on screen that we hold startup to
+STARTUP_BUDGET_SEC = 1.0
+
+class StartupTimer:
+    """Records named milestones relative to process start and reports them against the budget."""
+
+    def __init__(self, t0):
+        self.t0 = t0
+        self.marks = []
+
+    def mark(self, label):
+        elapsed = time.perf_counter() - self.t0
+        self.marks.append((label, elapsed))
+        logging.info(f"Startup: {label} at {elapsed * 1000:.0f} ms")
+        return elapsed
+
+    def report(self):
+        lines = [f"  {label:<28} {elapsed * 1000:8.0f} ms" for label, elapsed in self.marks]
+        logging.info("Startup timing report:\n" + "\n".join(lines))
+        shown = dict(self.marks).get("window shown")
+        if shown is not None and shown > STARTUP_BUDGET_SEC:
+            logging.warning(f"Startup took {shown * 1000:.0f} ms, over the {STARTUP_BUDGET_SEC * 1000:.0f} ms budget.")
+
+startup_timer = StartupTimer(STARTUP_T0)
+startup_timer.mark("imports done")
+
 # Right-click Context Menu for Entry
 class EntryWithContextMenu(ttk.Entry):
     def __init__(self, parent=None, **kwargs):
@@ -54,6 +88,8 @@ def extract_video_id(url):
     return None
 
 def load_thumbnail(url, thumb_label):
+    import requests
+    from PIL import Image, ImageTk
     logging.debug(f"Loading thumbnail for URL: {url}")
     video_id = extract_video_id(url)
     if not video_id:
@@ -92,56 +128,9 @@ def get_total_seconds(h_spin, m_spin, s_spin):
         logging.error("Invalid value in spinbox.", exc_info=True)
         return -1
 
-def get_video_title(url):
-    try:
-        result = subprocess.run(["yt-dlp", "--get-title", url], capture_output=True, text=True, check=True)
-        return result.stdout.strip()
-    except Exception as e:
-        logging.error("Failed to get video title", exc_info=True)
-        return None
-
-def sanitize_filename(name):
-    return re.sub(r'[\\/*?:"<>|]', '', name).replace(" ", "_")[:60]
-
-def format_time(seconds):
-    hours = seconds // 3600
-    minutes = (seconds % 3600) // 60
-    seconds = seconds % 60
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-
-def generate_thumbnail(video_path):
-    """Generate a clear thumbnail of the first frame using FFmpeg."""
-    thumb_path = f"{os.path.splitext(video_path)[0]}_thumb.jpg"
-    if not os.path.exists(thumb_path):
-        cmd = [
-            "ffmpeg",
-            "-i", video_path,
-            "-ss", "0",
-            "-frames:v", "1",
-            "-vf", "scale=170:96:force_original_aspect_ratio=decrease,pad=170:96:(ow-iw)/2:(oh-ih)/2",
-            "-q:v", "2",
-            thumb_path,
-            "-y"
-        ]
-        try:
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
-            logging.debug(f"Generated thumbnail for {video_path}: {thumb_path}")
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Failed to generate thumbnail: {e}")
-            return None
-    try:
-        pil_image = Image.open(thumb_path)
-        if pil_image.size != (170, 96):
-            pil_image = pil_image.resize((170, 96), Image.Resampling.LANCZOS)
-        photo = ImageTk.PhotoImage(pil_image)
-        logging.debug(f"Loaded thumbnail size: {pil_image.size}")
-        return photo
-    except Exception as e:
-        logging.error(f"Failed to load thumbnail {thumb_path}: {e}")
-        return None
-
 def create_placeholder_thumbnail():
     """Create a default placeholder image."""
+    from PIL import Image, ImageTk, ImageDraw
     placeholder = Image.new("RGB", (170, 96), "gray")
     draw = ImageDraw.Draw(placeholder)
     try:
@@ -153,93 +142,17 @@ def create_placeholder_thumbnail():
     logging.debug("Created placeholder thumbnail of size 170x96")
     return photo
 
-def run_download_and_trim(url, start_sec, duration_sec, mode, message_label,
-                          update_local_list_callback=None, complete_callback=None,
-                          progress_callback=None):
+def run_job_in_background(job, message_label, update_local_list_callback=None,
+                          complete_callback=None, progress_callback=None, runner=run_job):
     def worker():
         try:
-            if start_sec < 0 or duration_sec <= 0:
-                message_label.config(text="Error: Invalid start time or duration.")
-                logging.error(f"Invalid timing - start_sec: {start_sec}, duration_sec: {duration_sec}")
-                return
-
-            message_label.config(text="Downloading video (MP4)...")
-            download_cmd = [
-                "yt-dlp",
-                "--newline",
-                "-f", "bestvideo+bestaudio/best",
-                "--merge-output-format", "mp4",
-                "-o", "downloaded_video.mp4",
-                url
-            ]
-            proc = subprocess.Popen(download_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-            while True:
-                line = proc.stdout.readline()
-                if not line:
-                    break
-                logging.debug("yt-dlp: " + line.strip())
-                # Modified regex pattern to better match progress percentage
-                m = re.search(r'\[download\].*?(\d+(?:\.\d+)?)%', line)
-                if m and progress_callback:
-                    percent = float(m.group(1))
-                    # Use after() to schedule the update on the main thread
-                    message_label.after(1, lambda p=percent: progress_callback(p))
-            proc.stdout.close()
-            proc.wait()
-            if proc.returncode != 0:
-                message_label.config(text="Error: yt-dlp failed during download.")
-                logging.error("yt-dlp command failed.")
-                return
-
-            input_file = "downloaded_video.mp4"
-            if not os.path.exists(input_file):
-                message_label.config(text="Error: Downloaded file not found.")
-                logging.error("Downloaded video file not found.")
-                return
-
-            video_title = get_video_title(url) or "video"
-            clean_title = sanitize_filename(video_title)
-            new_full_filename = f"{clean_title}.mp4"
-            try:
-                if os.path.exists(new_full_filename):
-                    os.remove(new_full_filename)
-                os.rename(input_file, new_full_filename)
-                input_file = new_full_filename
-            except Exception as e:
-                message_label.config(text=f"Error: Failed to rename downloaded video: {e}")
-                logging.error("Failed to rename downloaded video", exc_info=True)
-                return
-
-            message_label.config(text="Trimming video with FFmpeg...")
-            def filename_time_format(secs):
-                h = secs // 3600
-                m = (secs % 3600) // 60
-                s = secs % 60
-                return f"{h:02d}h{m:02d}m{s:02d}s"
-            start_str = filename_time_format(start_sec)
-            if mode == "end":
-                end_sec = start_sec + duration_sec
-                time_str = f"{start_str}-{filename_time_format(end_sec)}"
-            else:
-                time_str = f"{start_str}+{filename_time_format(duration_sec)}"
-            output_filename = f"{clean_title}_{time_str}.mp4"
-
-            trim_cmd = [
-                "ffmpeg",
-                "-ss", format_time(start_sec),
-                "-i", input_file,
-                "-t", str(duration_sec),
-                "-c:v", "copy",
-                "-c:a", "aac",
-                output_filename
-            ]
-            
-            result = subprocess.run(trim_cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                message_label.config(text=f"Error: FFmpeg trimming failed.\n{result.stderr}")
-                logging.error("FFmpeg trimming failed.")
-                return
-
+            output_filename = runner(
+                job,
+                status_callback=lambda text: message_label.config(text=text),
+                # Use after() to schedule the update on the main thread
+                progress_callback=(lambda p: message_label.after(1, lambda: progress_callback(p)))
+                if progress_callback else None
+            )
             message_label.config(text=f"Success: {output_filename} created!")
             if update_local_list_callback:
                 message_label.after(0, update_local_list_callback)
@@ -252,16 +165,36 @@ def run_download_and_trim(url, start_sec, duration_sec, mode, message_label,
             else:
                 # If no complete_callback, just clear the message
                 message_label.after(3000, lambda: message_label.config(text=""))
+        except JobCancelled:
+            message_label.config(text="Cancelled. Partial files were removed.")
+            if complete_callback:
+                message_label.after(0, complete_callback)
+            message_label.after(3000, lambda: message_label.config(text=""))
         except Exception as e:
             message_label.config(text=f"Error: {e}")
-            logging.error("Exception during download and trim.", exc_info=True)
+            logging.error("Exception during job.", exc_info=True)
             if complete_callback:
                 message_label.after(0, complete_callback)
     threading.Thread(target=worker, daemon=True).start()
+    return job
+
+def run_download_and_trim(url, start_sec, duration_sec, mode, message_label, journal,
+                          update_local_list_callback=None, complete_callback=None,
+                          progress_callback=None):
+    if start_sec < 0 or duration_sec <= 0:
+        message_label.config(text="Error: Invalid start time or duration.")
+        logging.error(f"Invalid timing - start_sec: {start_sec}, duration_sec: {duration_sec}")
+        return None
+    entry = journal.create("download", url=url, start_sec=start_sec,
+                           duration_sec=duration_sec, mode=mode)
+    # Each job downloads to its own prefix so yt-dlp can resume its .part files after a restart
+    journal.update(entry["id"], download_prefix=f"downloaded_video_{entry['id']}")
+    return run_job_in_background(Job(journal, entry), message_label,
+                                 update_local_list_callback, complete_callback, progress_callback)
 
 # Main GUI Class
 class YouTubeTrimmerApp:
-    def __init__(self, root):
+    def __init__(self, root, server_url=None):
         self.root = root
         self.root.title("YouTube Video Downloader & Trimmer")
         self.root.geometry("1400x900")
@@ -271,6 +204,35 @@ class YouTubeTrimmerApp:
         self.source_option = tk.StringVar(value="local")
         self.mode = tk.StringVar(value="duration")
         self.thumbnail_cache = {}
+        self.placeholder_thumbnail = None
+        self.library_roots = load_library_roots()
+        self.library_items = {}
+        self.scan_results = None
+        self.scan_done = False
+        self.first_scan = True
+        self.group_clips = tk.BooleanVar(value=True)
+        self.query = parse_query("")
+        self.filter_job = None
+        self.hash_index = None
+        self.active_jobs = set()
+        # In thin-client mode jobs run in the trim daemon instead of this process, which then
+        # keeps no journal of its own and never touches (or resumes) the daemon's jobs
+        self.client = None
+        self.journal = None
+        if server_url:
+            from trimd import TrimClient, RemoteLibraryScanner
+            self.client = TrimClient(server_url)
+            # The daemon scans its library and makes thumbnails once for all clients
+            self.library_scanner = RemoteLibraryScanner(self.client, decode_thumbnails=True)
+            logging.debug(f"Running as a thin client of {server_url}")
+        else:
+            self.journal = JobJournal()
+            self.library_scanner = LibraryScanner(decode_thumbnails=True)
+
+        # Probe ffmpeg/ffprobe/yt-dlp in the background; the result arrives via on_tools_probed
+        self.tool_probe = ToolProbe().start(
+            callback=lambda result: self.root.after(0, self.on_tools_probed, result)
+        )
 
         # Apply YouTube-inspired style
         style = ttk.Style()
@@ -327,22 +289,51 @@ class YouTubeTrimmerApp:
         ttk.Button(local_control_frame, text="Browse", style="Modern.TButton",
                    command=self.on_browse_file).pack(side="left", padx=5)
 
+        library_frame = ttk.Frame(self.local_frame)
+        library_frame.pack(fill="x", pady=5)
+        ttk.Label(library_frame, text="Library Folders:").pack(side="left", padx=5)
+        self.library_roots_label = ttk.Label(library_frame, text="", relief="sunken", width=60)
+        self.library_roots_label.pack(side="left", padx=5)
+        # Thin clients browse the daemon's folders, which are set with its --library-root option
+        folder_state = "disabled" if self.client else "normal"
+        ttk.Button(library_frame, text="Add Folder", command=self.on_add_library_root,
+                   state=folder_state).pack(side="left", padx=5)
+        ttk.Button(library_frame, text="Reset Folders", command=self.on_reset_library_roots,
+                   state=folder_state).pack(side="left", padx=5)
+        self.duplicates_button = ttk.Button(library_frame, text="Find Duplicates", command=self.on_find_duplicates)
+        self.duplicates_button.pack(side="left", padx=5)
+        self.update_library_roots_label()
+
+        filter_frame = ttk.Frame(self.local_frame)
+        filter_frame.pack(fill="x", pady=5)
+        ttk.Label(filter_frame, text="Search:").pack(side="left", padx=5)
+        self.search_entry = EntryWithContextMenu(filter_frame, width=40)
+        self.search_entry.pack(side="left", padx=5)
+        self.search_entry.bind("<KeyRelease>", self.on_search_changed)
+        ttk.Label(filter_frame, text="e.g. cats dur>60 dur<10m size<500mb").pack(side="left", padx=5)
+        ttk.Checkbutton(filter_frame, text="Show clips under their source video", variable=self.group_clips,
+                        command=self.refresh_library_view).pack(side="left", padx=10)
+
         tree_frame = ttk.Frame(self.local_frame)
         tree_frame.pack(fill="both", expand=True, pady=5)
         style.configure("Custom.Treeview", rowheight=96, font=("Helvetica", 10))
         self.local_tree = ttk.Treeview(
             tree_frame,
-            columns=("Filename", "Size"),
+            columns=("Filename", "Duration", "Size", "Folder"),
             show="tree headings",
             height=5,
             style="Custom.Treeview"
         )
         self.local_tree.heading("#0", text="Preview")
         self.local_tree.heading("Filename", text="Video Filename")
+        self.local_tree.heading("Duration", text="Duration")
         self.local_tree.heading("Size", text="Size")
+        self.local_tree.heading("Folder", text="Folder")
         self.local_tree.column("#0", width=170, anchor="center")
         self.local_tree.column("Filename", width=400, anchor="w")
+        self.local_tree.column("Duration", width=90, anchor="e")
         self.local_tree.column("Size", width=100, anchor="e")
+        self.local_tree.column("Folder", width=200, anchor="w")
         self.local_tree.pack(side="left", fill="both", expand=True)
         scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.local_tree.yview)
         scrollbar.pack(side="right", fill="y")
@@ -352,7 +343,9 @@ class YouTubeTrimmerApp:
                    command=self.update_local_video_list).pack(pady=5)
 
         self.local_file_path = ""
-        self.update_local_video_list()
+        # Populate the list only once the window is mapped. An after_idle callback would
+        # still run before the first paint, because update_idletasks() runs idle callbacks.
+        self.map_binding = self.root.bind("<Map>", self.on_window_mapped, add="+")
 
         # Time Selection Frame
         self.time_frame = ttk.LabelFrame(self.main_frame, text="Trim Settings", padding="5")
@@ -419,6 +412,9 @@ class YouTubeTrimmerApp:
         self.download_button = ttk.Button(self.action_frame, text="Download and Trim", style="Modern.TButton",
                                           command=self.on_download_and_trim)
         self.download_button.pack(side="top", pady=5)
+        self.cancel_button = ttk.Button(self.action_frame, text="Cancel", bootstyle="danger",
+                                        command=self.on_cancel_jobs, state="disabled")
+        self.cancel_button.pack(side="top", pady=5)
 
         # Create a frame for the progress section
         self.progress_frame = ttk.Frame(self.main_frame)
@@ -434,6 +430,8 @@ class YouTubeTrimmerApp:
 
         self.update_mode()
         self.update_source()
+        if self.journal:
+            self.root.after(0, self.resume_interrupted_jobs)
 
     def update_mode(self):
         if self.mode.get() == "end":
@@ -476,31 +474,40 @@ class YouTubeTrimmerApp:
                     messagebox.showerror("Error", "Duration must be > 0.")
                     return
             
+            video_id = extract_video_id(url)
+            existing = self.get_hash_index().paths_for_video_id(video_id) if video_id else []
+            if existing and not messagebox.askyesno(
+                "Already Downloaded",
+                f"This video was already downloaded as:\n{existing[0]}\n\nDownload it again?"
+            ):
+                return
+
             # Clear any existing progress bar
             self.stop_progress_bar()
             
             # Update message and start progress bar
             self.message_label.config(text="Starting download...")
             self.start_progress_bar(determinate=True)
+
+            if self.client:
+                self.start_remote_job(url=url, start_sec=start_sec,
+                                      duration_sec=duration_sec, mode=self.mode.get())
+                return
             
-            def update_progress(percent):
-                if hasattr(self, "progress_bar") and self.progress_bar:
-                    self.progress_bar["value"] = percent
-                    if hasattr(self, "progress_label") and self.progress_label:
-                        self.progress_label.config(text=f"{percent:.1f}%")
-                    # Force update the GUI
-                    self.root.update_idletasks()
-            
-            run_download_and_trim(
+            job = run_download_and_trim(
                 url,
                 start_sec,
                 duration_sec,
                 self.mode.get(),
                 self.message_label,
+                self.journal,
                 update_local_list_callback=self.update_local_video_list,
-                complete_callback=self.stop_progress_bar,
-                progress_callback=update_progress
+                complete_callback=lambda: self.finish_job(job),
+                progress_callback=self.update_progress_bar
             )
+            if job:
+                self.active_jobs.add(job)
+                self.cancel_button.config(state="normal")
 
         elif self.source_option.get() == "local":
             if not self.local_file_path:
@@ -527,43 +534,107 @@ class YouTubeTrimmerApp:
             self.message_label.config(text="Starting trim on local video...")
             self.start_progress_bar(determinate=True)
 
-            def worker():
-                try:
-                    input_file = self.local_file_path
-                    base_name = sanitize_filename(os.path.splitext(os.path.basename(input_file))[0])
-                    def filename_time_format(secs):
-                        h = secs // 3600
-                        m = (secs % 3600) // 60
-                        s = secs % 60
-                        return f"{h:02d}h{m:02d}m{s:02d}s"
-                    start_str = filename_time_format(start_sec)
-                    if self.mode.get() == "end":
-                        end_sec = start_sec + duration_sec
-                        time_str = f"{start_str}-{filename_time_format(end_sec)}"
-                    else:
-                        time_str = f"{start_str}+{filename_time_format(duration_sec)}"
-                    output_filename = f"{base_name}_{time_str}.mp4"
-                    trim_cmd = [
-                        "ffmpeg",
-                        "-ss", format_time(start_sec),
-                        "-i", input_file,
-                        "-t", str(duration_sec),
-                        "-c:v", "copy",
-                        "-c:a", "aac",
-                        output_filename
-                    ]
-                    result = subprocess.run(trim_cmd, capture_output=True, text=True)
-                    if result.returncode != 0:
-                        self.message_label.config(text=f"Error: FFmpeg trimming failed.\n{result.stderr}")
-                        return
-                    self.message_label.config(text=f"Success: {output_filename} created!")
-                    self.root.after(0, self.update_local_video_list)
-                except Exception as e:
-                    self.message_label.config(text=f"Error: {e}")
-                    logging.error("Exception during local video trimming.", exc_info=True)
-                finally:
-                    self.root.after(0, self.stop_progress_bar)
-            threading.Thread(target=worker, daemon=True).start()
+            if self.client:
+                self.start_remote_job(source=os.path.abspath(self.local_file_path), start_sec=start_sec,
+                                      duration_sec=duration_sec, mode=self.mode.get())
+                return
+
+            base_name = sanitize_filename(os.path.splitext(os.path.basename(self.local_file_path))[0])
+            entry = self.journal.create(
+                "trim",
+                source=self.local_file_path,
+                output=clip_filename(base_name, start_sec, duration_sec, self.mode.get()),
+                start_sec=start_sec,
+                duration_sec=duration_sec,
+                mode=self.mode.get()
+            )
+            self.start_job(Job(self.journal, entry))
+
+    def start_job(self, job, complete_callback=None, runner=run_job):
+        self.active_jobs.add(job)
+        self.cancel_button.config(state="normal")
+        def on_complete():
+            self.finish_job(job)
+            if complete_callback:
+                complete_callback()
+        run_job_in_background(
+            job,
+            self.message_label,
+            update_local_list_callback=self.update_local_video_list,
+            complete_callback=on_complete,
+            progress_callback=self.update_progress_bar,
+            runner=runner
+        )
+
+    def start_remote_job(self, **params):
+        from trimd import RemoteJob, TrimServiceBusy, TrimServiceError, run_remote_job
+
+        def submit_failed(title, message):
+            self.stop_progress_bar()
+            self.message_label.config(text="")
+            messagebox.showwarning(title, message)
+
+        # Submit off the Tk thread; the HTTP call can take up to the client timeout
+        def worker():
+            try:
+                record = self.client.submit(**params)
+            except TrimServiceBusy as e:
+                self.root.after(0, submit_failed, "Server Busy", str(e))
+                return
+            except TrimServiceError as e:
+                self.root.after(0, submit_failed, "Error", f"Failed to submit job: {e}")
+                return
+            job = RemoteJob(self.client, record["id"])
+            self.root.after(0, lambda: self.start_job(job, runner=run_remote_job))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def finish_job(self, job):
+        self.active_jobs.discard(job)
+        # Remember downloads by video ID so a repeat download can be flagged beforehand
+        entry = getattr(job, "final_entry", None)
+        if entry and entry.get("url") and entry.get("source") and os.path.exists(entry["source"]):
+            video_id = extract_video_id(entry["url"])
+            if video_id:
+                self.get_hash_index().record_video_id(video_id, entry["source"])
+        if not self.active_jobs:
+            self.cancel_button.config(state="disabled")
+            self.stop_progress_bar()
+
+    def on_cancel_jobs(self):
+        logging.debug(f"Cancelling {len(self.active_jobs)} active job(s).")
+        for job in list(self.active_jobs):
+            job.cancel()
+
+    def resume_interrupted_jobs(self):
+        pending = self.journal.interrupted()
+        if not pending:
+            return
+        logging.debug(f"Found {len(pending)} interrupted job(s) in the journal.")
+        if not messagebox.askyesno(
+            "Resume Jobs",
+            f"{len(pending)} job(s) were interrupted when the app last closed.\n"
+            "Resume them now? Choosing No discards their partial files."
+        ):
+            for entry in pending:
+                cleanup_job_files(entry)
+                self.journal.remove(entry["id"])
+            return
+        pending.sort(key=lambda e: e["created"])
+
+        # Run resumed jobs one after another so they share the single progress bar
+        def resume_next():
+            if not pending:
+                return
+            entry = pending.pop(0)
+            if entry["kind"] == "trim" and not os.path.exists(entry["source"]):
+                logging.error(f"Source of interrupted job {entry['id']} is gone: {entry['source']}")
+                self.journal.remove(entry["id"])
+                resume_next()
+                return
+            self.message_label.config(text="Resuming interrupted job...")
+            self.start_progress_bar(determinate=True)
+            self.start_job(Job(self.journal, entry), complete_callback=resume_next)
+        resume_next()
 
     def update_source(self):
         # Always show both sections so the window displays everything.
@@ -599,38 +670,273 @@ class YouTubeTrimmerApp:
             self.local_tree.selection_remove(self.local_tree.selection())
             self.local_tree.selection_set(item)
             self.local_tree.focus(item)
-            file = self.local_tree.item(item, "values")[0]
-            self.local_file_path = os.path.abspath(file)
-            self.local_file_label.config(text=file)
+            # Row ids are the videos' absolute paths
+            self.local_file_path = item
+            self.local_file_label.config(text=os.path.basename(item))
         return "break"
 
+    def on_window_mapped(self, event):
+        # <Map> on the root is also delivered for every child widget; react to the window only, once
+        if event.widget is not self.root:
+            return
+        self.root.unbind("<Map>", self.map_binding)
+        startup_timer.mark("window shown")
+        startup_timer.report()
+        self.root.after(0, self.update_local_video_list)
+
+    def on_tools_probed(self, result):
+        startup_timer.mark("tool probe finished")
+        versions = result["versions"]
+        logging.debug(f"Tool versions: {versions}")
+        if not versions.get("ffmpeg") and self.client:
+            # The daemon does the trimming; locally FFmpeg is only needed for thumbnails
+            logging.warning("FFmpeg not found in PATH; local thumbnails are unavailable.")
+        elif not versions.get("ffmpeg"):
+            messagebox.showwarning("FFmpeg Missing", "FFmpeg not found in PATH. Please install FFmpeg!")
+            self.root.destroy()
+            return
+        if not versions.get("yt-dlp"):
+            self.message_label.config(text="Warning: yt-dlp not found in PATH. YouTube downloads will fail.")
+        elif not self.tool_probe.has_encoder("aac") or not self.tool_probe.has_muxer("mp4"):
+            logging.warning("FFmpeg build lacks the aac encoder or mp4 muxer; trimming may fail.")
+
+    def get_placeholder_thumbnail(self):
+        if self.placeholder_thumbnail is None:
+            self.placeholder_thumbnail = create_placeholder_thumbnail()
+        return self.placeholder_thumbnail
+
+    def update_library_roots_label(self):
+        if self.client:
+            self.library_roots_label.config(text=f"Managed by the trim daemon at {self.client.base_url}")
+            return
+        self.library_roots_label.config(text="; ".join(os.path.abspath(r) for r in self.library_roots))
+
+    def on_add_library_root(self):
+        folder = filedialog.askdirectory(title="Add Library Folder")
+        if folder and folder not in self.library_roots:
+            self.library_roots.append(folder)
+            save_library_roots(self.library_roots)
+            self.update_library_roots_label()
+            self.update_local_video_list()
+
+    def on_reset_library_roots(self):
+        self.library_roots = ["."]
+        save_library_roots(self.library_roots)
+        self.update_library_roots_label()
+        self.update_local_video_list()
+
+    def on_search_changed(self, event=None):
+        # Debounce so large libraries are not re-filtered on every keystroke
+        if self.filter_job:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(250, self.refresh_library_view)
+
     def update_local_video_list(self):
-        allowed_ext = ('.mp4', '.mkv', '.avi', '.mov')
+        """Rescan the library roots; rows stream into the list as the scanner reports them."""
+        self.library_items = {}
+        self.scan_done = False
+        self.clear_library_view()
+        # A fresh queue per scan means results from an older scan are simply never drained
+        self.scan_results = queue.Queue()
+        results = self.scan_results
+        self.library_scanner.scan(self.library_roots, on_item=results.put,
+                                  on_done=lambda: results.put(None))
+        self.drain_scan_results(results)
+
+    def drain_scan_results(self, results):
+        if results is not self.scan_results:
+            return
         try:
-            for item in self.local_tree.get_children():
-                self.local_tree.delete(item)
-            self.thumbnail_cache.clear()
-
-            files = [f for f in os.listdir('.') if f.lower().endswith(allowed_ext) and os.path.isfile(f)]
-            full_videos = [f for f in files if not re.search(r'\d{2}h\d{2}m\d{2}s', f)]
-            full_videos.sort()
-
-            for video in full_videos:
-                if video not in self.thumbnail_cache:
-                    thumbnail = generate_thumbnail(video)
-                    self.thumbnail_cache[video] = thumbnail if thumbnail else create_placeholder_thumbnail()
-                size_bytes = os.path.getsize(video)
-                size_str = (
-                    f"{size_bytes / (1024*1024):.2f} MB"
-                    if size_bytes > 1024*1024
-                    else f"{size_bytes / 1024:.2f} KB"
-                )
-                self.local_tree.insert(
-                    "", "end", text="", values=(video, size_str), image=self.thumbnail_cache[video]
-                )
-            logging.debug(f"Local video list updated with {len(full_videos)} videos.")
-        except Exception as e:
+            # Insert in batches so the UI stays responsive while huge libraries load
+            for _ in range(200):
+                item = results.get_nowait()
+                if item is None:
+                    self.on_scan_done()
+                    return
+                self.cache_thumbnail(item)
+                self.library_items[item["path"]] = item
+                self.show_library_item(item)
+        except queue.Empty:
+            pass
+        except Exception:
             logging.error("Failed to update local video list.", exc_info=True)
+        self.root.after(50, self.drain_scan_results, results)
+
+    def on_scan_done(self):
+        self.scan_done = True
+        self.show_orphan_clips()
+        logging.debug(f"Local video list updated with {len(self.library_items)} videos.")
+        if self.first_scan:
+            self.first_scan = False
+            startup_timer.mark("local list populated")
+
+    def clear_library_view(self):
+        self.local_tree.delete(*self.local_tree.get_children())
+        self.row_keys = {}
+        self.source_rows = {}
+        self.source_names = {}
+        self.pending_clips = {}
+
+    def refresh_library_view(self):
+        self.filter_job = None
+        self.query = parse_query(self.search_entry.get())
+        self.clear_library_view()
+        for item in self.library_items.values():
+            self.show_library_item(item)
+        if self.scan_done:
+            self.show_orphan_clips()
+
+    def show_library_item(self, item):
+        if item["clip_of"] and not self.group_clips.get():
+            return
+        if not matches_query(item, self.query):
+            return
+        if item["clip_of"]:
+            parent = self.source_rows.get(item["clip_of"])
+            if parent is None:
+                # The source may still be scanning; clips wait for it until the scan ends
+                self.pending_clips.setdefault(item["clip_of"], []).append(item)
+                return
+            self.insert_library_row(item, parent)
+        else:
+            self.insert_library_row(item, "")
+            self.source_rows[item["key"]] = item["path"]
+            self.source_names.setdefault(item["source_name"], []).append(item["path"])
+            for clip in self.pending_clips.pop(item["key"], []):
+                self.insert_library_row(clip, item["path"])
+
+    def show_orphan_clips(self):
+        # No source in the clip's own folder turned up, so fall back to a source of the
+        # same name elsewhere; trims are written to the working directory, not beside the source
+        for clips in self.pending_clips.values():
+            for clip in clips:
+                sources = self.source_names.get(clip["clip_of_name"])
+                self.insert_library_row(clip, min(sources) if sources else "")
+        self.pending_clips = {}
+
+    def insert_library_row(self, item, parent):
+        # Keep rows sorted by name as they arrive in completion order
+        keys = self.row_keys.setdefault(parent, [])
+        key = (item["name"].lower(), item["path"])
+        index = bisect.bisect(keys, key)
+        keys.insert(index, key)
+        duration = format_time(int(round(item["duration"]))) if item["duration"] is not None else ""
+        self.local_tree.insert(
+            parent, index, iid=item["path"], text="",
+            values=(item["name"], duration, format_size(item["size"]), item["folder"]),
+            image=self.get_thumbnail(item), open=True
+        )
+
+    def cache_thumbnail(self, item):
+        # The pool already decoded and resized the image; only the PhotoImage is made here
+        image = item.pop("image", None)
+        key = (item["path"], item["mtime"])
+        if image is not None and key not in self.thumbnail_cache:
+            from PIL import ImageTk
+            self.thumbnail_cache[key] = ImageTk.PhotoImage(image)
+
+    def get_thumbnail(self, item):
+        return self.thumbnail_cache.get((item["path"], item["mtime"])) or self.get_placeholder_thumbnail()
+
+    def get_hash_index(self):
+        if self.hash_index is None:
+            self.hash_index = HashIndex()
+        return self.hash_index
+
+    def on_find_duplicates(self):
+        if not self.scan_done:
+            messagebox.showinfo("Find Duplicates", "Please wait for the library scan to finish.")
+            return
+        items = list(self.library_items.values())
+        self.duplicates_button.config(state="disabled")
+        self.message_label.config(text=f"Checking {len(items)} videos for duplicates...")
+        self.start_progress_bar()
+
+        def worker():
+            try:
+                groups = find_duplicates(items, self.get_hash_index(), executor=self.library_scanner.executor)
+                self.root.after(0, self.show_duplicates, groups)
+            except Exception as e:
+                logging.error("Duplicate detection failed.", exc_info=True)
+                # Build the text now: `e` is unbound once the except block ends
+                msg = f"Error: {e}"
+                self.root.after(0, lambda: self.message_label.config(text=msg))
+            finally:
+                self.root.after(0, self.stop_progress_bar)
+                self.root.after(0, lambda: self.duplicates_button.config(state="normal"))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def show_duplicates(self, groups):
+        if not groups:
+            self.message_label.config(text="No duplicate videos found.")
+            self.root.after(3000, lambda: self.message_label.config(text=""))
+            return
+        self.message_label.config(text="")
+
+        window = ttk.Toplevel(self.root)
+        window.title("Duplicate Videos")
+        window.geometry("900x500")
+        summary_label = ttk.Label(window, text="")
+        summary_label.pack(fill="x", padx=10, pady=5)
+
+        def update_summary():
+            reclaimable = sum(item["size"] for group in group_rows.values() for item in group[1:])
+            summary_label.config(text=f"{len(group_rows)} group(s) of duplicates. Keeping only the largest copy "
+                                      f"in each would free {format_size(reclaimable)}.")
+
+        tree_frame = ttk.Frame(window)
+        tree_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        tree = ttk.Treeview(tree_frame, columns=("Duration", "Size"), show="tree headings")
+        tree.heading("#0", text="Video")
+        tree.heading("Duration", text="Duration")
+        tree.heading("Size", text="Size")
+        tree.column("#0", width=600, anchor="w")
+        tree.column("Duration", width=90, anchor="e")
+        tree.column("Size", width=100, anchor="e")
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        tree.configure(yscrollcommand=scrollbar.set)
+        group_rows = {}
+        for n, group in enumerate(groups, 1):
+            group_row = tree.insert("", "end", text=f"Group {n}: {group[0]['name']}", open=True)
+            group_rows[group_row] = list(group)
+            for item in group:
+                tree.insert(group_row, "end", iid=item["path"], text=item["path"],
+                            values=(format_time(int(round(item["duration"]))), format_size(item["size"])))
+        update_summary()
+
+        def delete_selected():
+            # Check against the dialog's own rows: library_items is emptied while a rescan runs
+            listed = {item["path"] for group in group_rows.values() for item in group}
+            paths = [row for row in tree.selection() if row in listed]
+            if not paths:
+                return
+            if not messagebox.askyesno("Delete Videos", f"Permanently delete {len(paths)} file(s)?", parent=window):
+                return
+            deleted = set()
+            for path in paths:
+                try:
+                    os.remove(path)
+                    tree.delete(path)
+                    deleted.add(path)
+                    logging.debug(f"Deleted duplicate video {path}")
+                except OSError as e:
+                    messagebox.showerror("Error", f"Failed to delete {path}: {e}", parent=window)
+            if not deleted:
+                return
+            self.get_hash_index().remove(deleted)
+            # A group with one copy left is no longer a duplicate
+            for group_row, group in list(group_rows.items()):
+                group[:] = [item for item in group if item["path"] not in deleted]
+                if len(group) < 2:
+                    tree.delete(group_row)
+                    del group_rows[group_row]
+            update_summary()
+            self.update_local_video_list()
+
+        ttk.Button(window, text="Delete Selected", bootstyle="danger",
+                   command=delete_selected).pack(pady=5)
 
     def start_progress_bar(self, determinate=False):
         # Remove any existing progress bar and label
@@ -673,21 +979,23 @@ class YouTubeTrimmerApp:
             self.progress_label.config(text=f"{percent:.1f}%")
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="YouTube Video Downloader & Trimmer")
+    parser.add_argument("--server", metavar="URL",
+                        help="Run jobs on a trim daemon (e.g. http://127.0.0.1:8765) instead of locally")
+    args = parser.parse_args()
+
     root = ttk.Window(themename="flatly")  # Using ttkbootstrap window with a base theme
+    startup_timer.mark("window created")
     logging.debug("Starting YouTubeTrimmerApp with ttkbootstrap theme...")
-    try:
-        subprocess.run(["ffmpeg", "-version"], check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        messagebox.showwarning("FFmpeg Missing", "FFmpeg not found in PATH. Please install FFmpeg!")
-        root.destroy()
-    else:
-        app = YouTubeTrimmerApp(root)
-        # Center the window on the screen
-        width, height = 1400, 900
-        root.update_idletasks()  # Ensure the window has been drawn
-        screen_width = root.winfo_screenwidth()
-        screen_height = root.winfo_screenheight()
-        x = (screen_width - width) // 2
-        y = (screen_height - height) // 2
-        root.geometry(f"{width}x{height}+{x}+{y}")
-        root.mainloop()
+    app = YouTubeTrimmerApp(root, server_url=args.server)
+    startup_timer.mark("app constructed")
+    # Center the window on the screen
+    width, height = 1400, 900
+    root.update_idletasks()  # Ensure the window has been drawn
+    screen_width = root.winfo_screenwidth()
+    screen_height = root.winfo_screenheight()
+    x = (screen_width - width) // 2
+    y = (screen_height - height) // 2
+    root.geometry(f"{width}x{height}+{x}+{y}")
+    root.mainloop()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+import os
+import re
+import glob
+import json
+import time
+import uuid
+import signal
+import logging
+import threading
+import subprocess
+
+# Journal of in-flight jobs, kept next to the downloads in the working directory
+JOURNAL_FILE = ".yttrimmer_jobs.json"
+# Stages a job can be interrupted in; anything else is terminal and dropped from the journal
+ACTIVE_STAGES = ("queued", "downloading", "trimming")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobError(Exception):
+    pass
+
+
+# Helper Functions
+def get_video_title(url):
+    try:
+        result = subprocess.run(["yt-dlp", "--get-title", url], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        logging.error("Failed to get video title", exc_info=True)
+        return None
+
+def sanitize_filename(name):
+    return re.sub(r'[\\/*?:"<>|]', '', name).replace(" ", "_")[:60]
+
+def format_time(seconds):
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    seconds = seconds % 60
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+def filename_time_format(secs):
+    h = secs // 3600
+    m = (secs % 3600) // 60
+    s = secs % 60
+    return f"{h:02d}h{m:02d}m{s:02d}s"
+
+def clip_filename(base_name, start_sec, duration_sec, mode):
+    start_str = filename_time_format(start_sec)
+    if mode == "end":
+        end_sec = start_sec + duration_sec
+        time_str = f"{start_str}-{filename_time_format(end_sec)}"
+    else:
+        time_str = f"{start_str}+{filename_time_format(duration_sec)}"
+    return f"{base_name}_{time_str}.mp4"
+
+def claim_filename(stem, ext):
+    """Create an empty stem + ext (or stem_2 + ext, ...) and return its name.
+
+    O_EXCL makes checking and taking the name one step, so two downloads whose titles
+    sanitize alike can never both pick it; the caller renames its file over the placeholder.
+    """
+    candidate = stem
+    n = 2
+    while True:
+        try:
+            os.close(os.open(candidate + ext, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return candidate + ext
+        except FileExistsError:
+            candidate = f"{stem}_{n}"
+            n += 1
+
+def partial_files(prefix):
+    """All files yt-dlp writes for a download prefix (.part, .ytdl, per-format fragments)."""
+    return glob.glob(glob.escape(prefix) + "*")
+
+def partial_bytes(prefix):
+    total = 0
+    for path in partial_files(prefix):
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+def cleanup_job_files(entry):
+    """Delete the partial outputs of a job. Finished downloads and source videos are kept."""
+    paths = []
+    if entry.get("download_prefix"):
+        paths.extend(partial_files(entry["download_prefix"]))
+    if entry.get("output"):
+        paths.append(entry["output"] + ".part")
+    # An empty downloaded_as is the placeholder from claim_filename, never filled
+    downloaded_as = entry.get("downloaded_as")
+    if downloaded_as and os.path.exists(downloaded_as) and os.path.getsize(downloaded_as) == 0:
+        paths.append(downloaded_as)
+    for path in paths:
+        try:
+            os.remove(path)
+            logging.debug(f"Removed partial file: {path}")
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logging.error(f"Failed to remove partial file {path}", exc_info=True)
+
+def process_group_kwargs():
+    # Start each tool in its own process group so the helpers it spawns
+    # (yt-dlp runs ffmpeg to merge streams) can be killed along with it.
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+def kill_process_tree(proc):
+    logging.debug(f"Killing process tree of PID {proc.pid}")
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], capture_output=True)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except OSError:
+        logging.error(f"Failed to kill process tree of PID {proc.pid}", exc_info=True)
+
+
+class JobJournal:
+    """Crash-safe record of every job's stage, temp paths and progress, persisted as JSON."""
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = self._load()
+        logging.debug(f"Loaded job journal {path} with {len(self.entries)} entries.")
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {entry["id"]: entry for entry in data.get("jobs", [])}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError, AttributeError):
+            logging.error(f"Job journal {self.path} is unreadable, starting empty.", exc_info=True)
+            return {}
+
+    def _save(self):
+        # Write to a temp file and swap it in so a crash never leaves a truncated journal
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"jobs": list(self.entries.values())}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _unique_output(self, filename):
+        # Caller holds the lock. Skips names of existing clips, in-progress trims and
+        # outputs already reserved by other jobs, so a trim never overwrites a clip.
+        reserved = {e.get("output") for e in self.entries.values()}
+        stem, ext = os.path.splitext(filename)
+        candidate = filename
+        n = 2
+        while candidate in reserved or os.path.exists(candidate) or os.path.exists(candidate + ".part"):
+            candidate = f"{stem}_{n}{ext}"
+            n += 1
+        return candidate
+
+    def create(self, kind, **fields):
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        entry = {"id": job_id, "kind": kind, "stage": "queued", "bytes_done": 0,
+                 "created": now, "updated": now}
+        entry.update(fields)
+        with self.lock:
+            if entry.get("output"):
+                entry["output"] = self._unique_output(entry["output"])
+            self.entries[job_id] = entry
+            self._save()
+        logging.debug(f"Created {kind} job {job_id}.")
+        return dict(entry)
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            entry = self.entries.get(job_id)
+            if entry is None:
+                return
+            entry.update(fields)
+            entry["updated"] = time.time()
+            self._save()
+
+    def reserve_output(self, job_id, filename):
+        """Record a job's clip name, made unique, and return it."""
+        with self.lock:
+            entry = self.entries.get(job_id)
+            if entry is None:
+                return filename
+            entry["output"] = self._unique_output(filename)
+            entry["updated"] = time.time()
+            self._save()
+            return entry["output"]
+
+    def get(self, job_id):
+        with self.lock:
+            entry = self.entries.get(job_id)
+            return dict(entry) if entry else None
+
+    def remove(self, job_id):
+        with self.lock:
+            if self.entries.pop(job_id, None) is not None:
+                self._save()
+
+    def interrupted(self):
+        with self.lock:
+            return [dict(e) for e in self.entries.values() if e["stage"] in ACTIVE_STAGES]
+
+
+class Job:
+    """Handle on a journaled job: runs its external processes and can cancel them."""
+
+    def __init__(self, journal, entry):
+        self.journal = journal
+        self.id = entry["id"]
+        self.cancel_event = threading.Event()
+        self.procs = []
+        self.lock = threading.Lock()
+        # Last journal entry, kept after the job finishes and leaves the journal
+        self.final_entry = None
+
+    @property
+    def entry(self):
+        return self.journal.get(self.id)
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def update(self, **fields):
+        self.journal.update(self.id, **fields)
+
+    def popen(self, cmd, **kwargs):
+        if self.cancelled:
+            raise JobCancelled()
+        proc = subprocess.Popen(cmd, **process_group_kwargs(), **kwargs)
+        with self.lock:
+            self.procs.append(proc)
+        # cancel() may have run between the check above and registering the process
+        if self.cancelled:
+            kill_process_tree(proc)
+        return proc
+
+    def release(self, proc):
+        with self.lock:
+            if proc in self.procs:
+                self.procs.remove(proc)
+        if self.cancelled:
+            raise JobCancelled()
+
+    def cancel(self):
+        logging.debug(f"Cancelling job {self.id}.")
+        self.cancel_event.set()
+        with self.lock:
+            procs = list(self.procs)
+        for proc in procs:
+            kill_process_tree(proc)
+
+
+def download_stage(job, progress_callback=None):
+    entry = job.entry
+    prefix = entry["download_prefix"]
+    target = f"{prefix}.mp4"
+    download_cmd = [
+        "yt-dlp",
+        "--newline",
+        "--continue",
+        "-f", "bestvideo+bestaudio/best",
+        "--merge-output-format", "mp4",
+        "-o", target,
+        entry["url"]
+    ]
+    proc = job.popen(download_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    last_saved = 0.0
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            break
+        logging.debug("yt-dlp: " + line.strip())
+        m = re.search(r'\[download\].*?(\d+(?:\.\d+)?)%', line)
+        if m:
+            percent = float(m.group(1))
+            if progress_callback:
+                progress_callback(percent)
+            # Journal progress at most once a second; the partial files are the real resume state
+            now = time.monotonic()
+            if now - last_saved >= 1.0:
+                job.update(bytes_done=partial_bytes(prefix))
+                last_saved = now
+    proc.stdout.close()
+    proc.wait()
+    job.release(proc)
+    if proc.returncode != 0:
+        raise JobError("yt-dlp failed during download.")
+    if not os.path.exists(target):
+        raise JobError("Downloaded file not found.")
+    job.update(bytes_done=os.path.getsize(target))
+    return target
+
+def trim_stage(job):
+    entry = job.entry
+    output_filename = entry["output"]
+    partial_output = output_filename + ".part"
+    trim_cmd = [
+        "ffmpeg",
+        "-y",
+        "-ss", format_time(entry["start_sec"]),
+        "-i", entry["source"],
+        "-t", str(entry["duration_sec"]),
+        "-c:v", "copy",
+        "-c:a", "aac",
+        "-f", "mp4",
+        partial_output
+    ]
+    proc = job.popen(trim_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.PIPE, text=True)
+    _, stderr = proc.communicate()
+    job.release(proc)
+    if proc.returncode != 0:
+        raise JobError(f"FFmpeg trimming failed.\n{stderr}")
+    os.replace(partial_output, output_filename)
+    return output_filename
+
+def run_job(job, status_callback=None, progress_callback=None):
+    """Drive a job through its remaining stages and return the trimmed output filename.
+
+    Safe to call on a job loaded from the journal after a crash: downloads resume
+    from their partial files and trims are redone from scratch.
+    """
+    def status(text):
+        if status_callback:
+            status_callback(text)
+
+    try:
+        entry = job.entry
+        if entry["kind"] == "download" and entry["stage"] in ("queued", "downloading"):
+            new_full_filename = entry.get("downloaded_as")
+            if (new_full_filename and not os.path.exists(f"{entry['download_prefix']}.mp4")
+                    and os.path.exists(new_full_filename)):
+                # Interrupted after the rename below: the download is already complete
+                logging.debug(f"Job {job.id} resumes with its renamed download {new_full_filename}")
+            else:
+                status("Downloading video (MP4)...")
+                job.update(stage="downloading")
+                input_file = download_stage(job, progress_callback)
+
+                if not new_full_filename:
+                    video_title = get_video_title(entry["url"]) or "video"
+                    try:
+                        new_full_filename = claim_filename(sanitize_filename(video_title), ".mp4")
+                    except OSError as e:
+                        raise JobError(f"Failed to rename downloaded video: {e}") from e
+                    # Journal the name before renaming, so a crash in between can find the video
+                    job.update(downloaded_as=new_full_filename)
+                try:
+                    os.replace(input_file, new_full_filename)
+                except OSError as e:
+                    raise JobError(f"Failed to rename downloaded video: {e}") from e
+            clean_title = os.path.splitext(new_full_filename)[0]
+            job.journal.reserve_output(
+                job.id, clip_filename(clean_title, entry["start_sec"], entry["duration_sec"], entry["mode"]))
+            job.update(stage="trimming", source=new_full_filename)
+        else:
+            job.update(stage="trimming")
+
+        status("Trimming video with FFmpeg...")
+        output_filename = trim_stage(job)
+        job.final_entry = job.entry
+        job.journal.remove(job.id)
+        logging.debug(f"Job {job.id} finished: {output_filename}")
+        return output_filename
+    except Exception as e:
+        if isinstance(e, JobCancelled):
+            logging.debug(f"Job {job.id} cancelled.")
+        else:
+            logging.error(f"Job {job.id} failed.", exc_info=True)
+        entry = job.entry
+        if entry:
+            job.final_entry = entry
+            cleanup_job_files(entry)
+        job.journal.remove(job.id)
+        raise
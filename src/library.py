@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait
+from jobs import sanitize_filename
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov')
+SETTINGS_FILE = os.path.join(os.path.expanduser("~"), ".yttrimmer_settings.json")
+# Clips are named "<sanitized source>_<start>-<end>.mp4" or "<sanitized source>_<start>+<duration>.mp4",
+# with "_2", "_3"... appended when a clip of the same range already exists
+CLIP_NAME_PATTERN = re.compile(r"^(?P<base>.+)_\d{2}h\d{2}m\d{2}s[-+]\d{2}h\d{2}m\d{2}s(?:_\d+)?$")
+# In-progress downloads from jobs.download_stage, renamed once the title is known
+TEMP_DOWNLOAD_PREFIX = "downloaded_video_"
+# Thumbnails go to a per-user cache, never next to the videos, which may be read-only or shared
+THUMBNAIL_CACHE_DIR = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+    or os.path.join(os.path.expanduser("~"), ".cache"),
+    "yttrimmer", "thumbnails")
+THUMBNAIL_SIZE = (170, 96)
+
+
+def load_library_roots():
+    try:
+        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+            roots = json.load(f).get("library_roots")
+        if roots:
+            return roots
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, AttributeError):
+        logging.error(f"Settings file {SETTINGS_FILE} is unreadable.", exc_info=True)
+    return ["."]
+
+def save_library_roots(roots):
+    try:
+        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        settings = {}
+    settings["library_roots"] = roots
+    try:
+        with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
+            json.dump(settings, f, indent=2)
+    except OSError:
+        logging.error(f"Failed to save settings to {SETTINGS_FILE}", exc_info=True)
+
+def format_size(size_bytes):
+    if size_bytes > 1024 * 1024 * 1024:
+        return f"{size_bytes / (1024*1024*1024):.2f} GB"
+    if size_bytes > 1024 * 1024:
+        return f"{size_bytes / (1024*1024):.2f} MB"
+    return f"{size_bytes / 1024:.2f} KB"
+
+def source_key(directory, stem):
+    """Key shared by a video and the clips generated from it (clips use the sanitized stem)."""
+    return os.path.normcase(os.path.join(directory, sanitize_filename(stem)))
+
+def source_name(stem):
+    # Clips are written to the working directory, not next to their source, so a clip in
+    # another folder can only be matched to its source by the sanitized name
+    return os.path.normcase(sanitize_filename(stem))
+
+def iter_video_files(root):
+    """Yield paths of videos under root, recursively. Hidden entries and symlinked dirs are skipped."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif (entry.name.lower().endswith(VIDEO_EXTENSIONS)
+                              and not entry.name.startswith(TEMP_DOWNLOAD_PREFIX)
+                              and entry.is_file()):
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError as e:
+            logging.debug(f"Skipping unreadable directory {directory}: {e}")
+
+def thumbnail_path(path, mtime, size):
+    key = f"{os.path.abspath(path)}\0{mtime}\0{size}".encode("utf-8")
+    return os.path.join(THUMBNAIL_CACHE_DIR, hashlib.sha1(key).hexdigest() + ".jpg")
+
+def generate_thumbnail(path, mtime, size):
+    """Generate a clear thumbnail of the first frame using FFmpeg and return its cache path."""
+    thumb_path = thumbnail_path(path, mtime, size)
+    if os.path.exists(thumb_path):
+        return thumb_path
+    # Render to a private name and rename, so concurrent scans never see a half-written file
+    tmp_path = f"{thumb_path[:-4]}.{os.getpid()}.{threading.get_ident()}.jpg"
+    cmd = [
+        "ffmpeg",
+        "-i", path,
+        "-ss", "0",
+        "-frames:v", "1",
+        "-vf", "scale=170:96:force_original_aspect_ratio=decrease,pad=170:96:(ow-iw)/2:(oh-ih)/2",
+        "-q:v", "2",
+        tmp_path,
+        "-y"
+    ]
+    try:
+        os.makedirs(THUMBNAIL_CACHE_DIR, exist_ok=True)
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        os.replace(tmp_path, thumb_path)
+        logging.debug(f"Generated thumbnail for {path}: {thumb_path}")
+        return thumb_path
+    except (subprocess.CalledProcessError, OSError) as e:
+        logging.error(f"Failed to generate thumbnail: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+def decode_thumbnail(source):
+    """Open and size a thumbnail (path or file object) with PIL, off the Tk thread.
+
+    The GUI then only has to wrap the result in an ImageTk.PhotoImage.
+    """
+    from PIL import Image
+    try:
+        pil_image = Image.open(source)
+        pil_image.load()
+        if pil_image.size != THUMBNAIL_SIZE:
+            pil_image = pil_image.resize(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        return pil_image
+    except Exception as e:
+        logging.error(f"Failed to load thumbnail {source}: {e}")
+        return None
+
+def probe_duration(path):
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        return float(result.stdout.strip())
+    except (OSError, subprocess.TimeoutExpired, ValueError):
+        logging.debug(f"Could not probe duration of {path}")
+        return None
+
+def parse_query(text):
+    """Parse a search string such as "cats dur>60 dur<5m size>100mb" into filter terms."""
+    query = {"words": [], "min_duration": None, "max_duration": None, "min_size": None, "max_size": None}
+    duration_units = {"": 1, "s": 1, "m": 60, "h": 3600}
+    size_units = {"": 1, "b": 1, "kb": 1024, "mb": 1024**2, "gb": 1024**3}
+    for token in text.lower().split():
+        m = re.fullmatch(r"(dur|size)([<>])(\d+(?:\.\d+)?)([a-z]*)", token)
+        if m:
+            field, op, number, unit = m.groups()
+            units = duration_units if field == "dur" else size_units
+            if unit in units:
+                value = float(number) * units[unit]
+                name = "duration" if field == "dur" else "size"
+                query[("min_" if op == ">" else "max_") + name] = value
+                continue
+        query["words"].append(token)
+    return query
+
+def matches_query(item, query):
+    name = item["name"].lower()
+    if any(word not in name for word in query["words"]):
+        return False
+    for key, value in (("duration", item["duration"]), ("size", item["size"])):
+        low, high = query["min_" + key], query["max_" + key]
+        if (low is not None or high is not None) and value is None:
+            return False
+        if low is not None and value <= low:
+            return False
+        if high is not None and value >= high:
+            return False
+    return True
+
+
+class LibraryScanner:
+    """Walks library roots and fans stat/probe/thumbnail work out to a thread pool.
+
+    Results stream to on_item(item) from worker threads as they complete; items are
+    plain dicts and are reused on later scans while the file's size and mtime match.
+    With decode_thumbnails, each reported item is a copy carrying the decoded PIL
+    thumbnail under "image"; the cached item never holds it.
+    """
+
+    def __init__(self, make_thumbnails=True, decode_thumbnails=False, max_workers=None):
+        self.make_thumbnails = make_thumbnails
+        self.decode_thumbnails = decode_thumbnails
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or min(8, (os.cpu_count() or 2) * 2),
+                                           thread_name_prefix="library")
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.generation = 0
+
+    def scan(self, roots, on_item, on_done=None):
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+
+        def walk():
+            seen = set()
+            futures = []
+            for root in roots:
+                root = os.path.abspath(root)
+                for path in iter_video_files(root):
+                    if generation != self.generation:
+                        return
+                    key = os.path.normcase(path)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    futures.append(self.executor.submit(self.inspect, generation, root, path, on_item))
+            wait(futures)
+            logging.debug(f"Library scan of {len(roots)} root(s) found {len(futures)} videos.")
+            if generation == self.generation and on_done:
+                on_done()
+        threading.Thread(target=walk, daemon=True).start()
+
+    def inspect(self, generation, root, path, on_item):
+        if generation != self.generation:
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self.lock:
+            item = self.cache.get(path)
+        if item is None or item["mtime"] != st.st_mtime or item["size"] != st.st_size:
+            directory, name = os.path.split(path)
+            stem = os.path.splitext(name)[0]
+            m = CLIP_NAME_PATTERN.match(stem)
+            item = {
+                "path": path,
+                "name": name,
+                "folder": os.path.relpath(directory, root),
+                "size": st.st_size,
+                "mtime": st.st_mtime,
+                "duration": probe_duration(path),
+                "thumb": generate_thumbnail(path, st.st_mtime, st.st_size) if self.make_thumbnails else None,
+                "key": source_key(directory, stem),
+                "source_name": source_name(stem),
+                "clip_of": source_key(directory, m.group("base")) if m else None,
+                "clip_of_name": source_name(m.group("base")) if m else None,
+            }
+            with self.lock:
+                self.cache[path] = item
+        if generation != self.generation:
+            return
+        if self.decode_thumbnails:
+            item = dict(item, image=decode_thumbnail(item["thumb"]) if item["thumb"] else None)
+        on_item(item)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+import os
+import re
+import json
+import shutil
+import logging
+import threading
+import subprocess
+
+# Probe results are cached per machine and reused until one of the tool binaries changes
+PROBE_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".yttrimmer_tools.json")
+TOOLS = ("ffmpeg", "ffprobe", "yt-dlp")
+
+
+def tool_fingerprint(name):
+    path = shutil.which(name)
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [path, st.st_mtime, st.st_size]
+
+def run_quiet(cmd):
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=20)
+    except (OSError, subprocess.TimeoutExpired):
+        logging.error(f"Failed to run {cmd[0]}", exc_info=True)
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout
+
+def parse_version(output):
+    if not output:
+        return None
+    first_line = output.strip().splitlines()[0]
+    # "ffmpeg version 6.1.1 Copyright ..." / yt-dlp prints just "2024.08.06"
+    m = re.search(r"version\s+(\S+)", first_line)
+    return m.group(1) if m else first_line.strip()
+
+def parse_ffmpeg_list(output, flag_pattern):
+    """Names from `ffmpeg -encoders` / `ffmpeg -muxers` listings, after the legend block."""
+    names = []
+    if not output:
+        return names
+    in_body = False
+    for line in output.splitlines():
+        if not in_body:
+            in_body = line.strip().startswith("--")
+            continue
+        m = re.match(r"^\s*" + flag_pattern + r"\s+(\S+)", line)
+        if m:
+            names.append(m.group(1))
+    return names
+
+def load_probe_cache(cache_path):
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logging.error(f"Tool probe cache {cache_path} is unreadable, probing again.", exc_info=True)
+        return None
+
+def save_probe_cache(cache_path, result):
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        logging.error(f"Failed to write tool probe cache {cache_path}", exc_info=True)
+
+def probe_tools(cache_path=PROBE_CACHE_FILE):
+    """Versions of ffmpeg/ffprobe/yt-dlp plus the encoders and muxers ffmpeg supports."""
+    fingerprints = {name: tool_fingerprint(name) for name in TOOLS}
+    cached = load_probe_cache(cache_path)
+    if cached and cached.get("fingerprints") == fingerprints:
+        logging.debug("Using cached tool probe results.")
+        return cached
+
+    versions = {}
+    for name in TOOLS:
+        if fingerprints[name]:
+            flag = "--version" if name == "yt-dlp" else "-version"
+            versions[name] = parse_version(run_quiet([name, flag]))
+        else:
+            versions[name] = None
+    encoders, muxers = [], []
+    if fingerprints["ffmpeg"]:
+        encoders = parse_ffmpeg_list(run_quiet(["ffmpeg", "-hide_banner", "-encoders"]), r"[VAS][A-Z.]{5}")
+        muxers = parse_ffmpeg_list(run_quiet(["ffmpeg", "-hide_banner", "-muxers"]), r"D?Ed?")
+    result = {"fingerprints": fingerprints, "versions": versions,
+              "encoders": encoders, "muxers": muxers}
+    save_probe_cache(cache_path, result)
+    logging.debug(f"Probed tools: {versions}, {len(encoders)} encoders, {len(muxers)} muxers.")
+    return result
+
+
+class ToolProbe:
+    """Runs probe_tools() on a background thread so startup never waits on subprocesses."""
+
+    def __init__(self, cache_path=PROBE_CACHE_FILE):
+        self.cache_path = cache_path
+        self.result = None
+        self.done = threading.Event()
+
+    def start(self, callback=None):
+        def worker():
+            try:
+                self.result = probe_tools(self.cache_path)
+            except Exception:
+                logging.error("Tool probe failed.", exc_info=True)
+                self.result = {"versions": {name: None for name in TOOLS}, "encoders": [], "muxers": []}
+            finally:
+                self.done.set()
+            if callback:
+                callback(self.result)
+        threading.Thread(target=worker, daemon=True).start()
+        return self
+
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        return self.result
+
+    def available(self, tool):
+        return bool(self.result and self.result["versions"].get(tool))
+
+    def has_encoder(self, name):
+        return bool(self.result and name in self.result["encoders"])
+
+    def has_muxer(self, name):
+        return bool(self.result and name in self.result["muxers"])
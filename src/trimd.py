@@ -0,0 +1,653 @@
+#!/usr/bin/env python3
+"""Local trim daemon: one shared worker pool serving download/trim jobs over HTTP/JSON.
+
+    POST   /jobs              submit {"url" | "source", "start_sec", "duration_sec", "mode"}
+    GET    /jobs              list jobs
+    GET    /jobs/<id>         poll a job
+    DELETE /jobs/<id>         cancel a job
+    GET    /jobs/<id>/result  download the trimmed clip
+    GET    /library           scanned videos; ?refresh=1 rescans, ?since=N skips the first N
+    GET    /library/thumbnail thumbnail JPEG of a library video, ?path=<video path>
+    GET    /health            tool versions, queue depth and worker count
+
+Submissions must be sent as application/json (so browsers preflight cross-origin
+posts) and get 503 with Retry-After when the queue is full. Local sources must lie
+inside the daemon's workdir or one of its --library-root folders. Requests whose
+Host header is not localhost or the --host address get 403, against DNS rebinding.
+"""
+import io
+import os
+import json
+import time
+import queue
+import shutil
+import logging
+import argparse
+import threading
+import contextlib
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from jobs import (JobJournal, Job, JobCancelled, JobError, run_job, cleanup_job_files,
+                  sanitize_filename, clip_filename)
+from probe import ToolProbe
+from library import LibraryScanner, decode_thumbnail
+
+# Separate from the GUI's jobs.JOURNAL_FILE so a GUI started in the same directory
+# never mistakes the daemon's in-flight jobs for its own interrupted ones
+DAEMON_JOURNAL_FILE = ".yttrimmer_daemon_jobs.json"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Largest accepted job submission body
+MAX_BODY_BYTES = 64 * 1024
+# Finished jobs stay pollable for this long before they are forgotten
+RESULT_TTL_SEC = 3600
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+class TrimServiceBusy(Exception):
+    pass
+
+
+class TrimServiceError(Exception):
+    pass
+
+
+def is_within(path, roots):
+    path = os.path.normcase(os.path.realpath(path))
+    for root in roots:
+        root = os.path.normcase(os.path.realpath(root))
+        try:
+            if os.path.commonpath([path, root]) == root:
+                return True
+        except ValueError:
+            # Different drives on Windows
+            continue
+    return False
+
+def parse_job_params(payload, allowed_roots=(".",)):
+    """Validate a submitted job; returns journal fields or raises ValueError.
+
+    Local sources are only accepted inside allowed_roots.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object.")
+    url = payload.get("url")
+    source = payload.get("source")
+    if bool(url) == bool(source):
+        raise ValueError("Specify exactly one of 'url' or 'source'.")
+    try:
+        start_sec = int(payload.get("start_sec", 0))
+        duration_sec = int(payload["duration_sec"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("'start_sec' and 'duration_sec' must be integers.")
+    if start_sec < 0 or duration_sec <= 0:
+        raise ValueError("Invalid start time or duration.")
+    mode = payload.get("mode", "duration")
+    if mode not in ("duration", "end"):
+        raise ValueError("'mode' must be 'duration' or 'end'.")
+    fields = {"start_sec": start_sec, "duration_sec": duration_sec, "mode": mode}
+    if url:
+        if not isinstance(url, str) or not url.lower().startswith(("http://", "https://")):
+            raise ValueError("'url' must be an http(s) URL.")
+        fields.update(kind="download", url=url)
+    else:
+        if not isinstance(source, str):
+            raise ValueError("'source' must be a path string.")
+        source = os.path.abspath(source)
+        if not is_within(source, allowed_roots):
+            raise ValueError("Source video must be inside the daemon's working or library folders.")
+        if not os.path.isfile(source):
+            raise ValueError(f"Source video not found: {source}")
+        base_name = sanitize_filename(os.path.splitext(os.path.basename(source))[0])
+        fields.update(kind="trim", source=source,
+                      output=clip_filename(base_name, start_sec, duration_sec, mode))
+    return fields
+
+
+class TrimService:
+    """Shared worker pool and caches behind the HTTP API."""
+
+    def __init__(self, workers=2, max_queue=16, journal=None, library_roots=()):
+        self.journal = journal or JobJournal(DAEMON_JOURNAL_FILE)
+        # Folders local "source" videos may come from, besides the working directory
+        self.allowed_roots = [os.getcwd()] + [os.path.abspath(root) for root in library_roots]
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.records = {}
+        self.lock = threading.Lock()
+        # url -> downloaded source video, so repeat requests for one video skip yt-dlp
+        self.download_cache = {}
+        self.url_locks = {}
+        self.tool_probe = ToolProbe().start()
+        # One library scan and thumbnail cache shared by every client
+        self.library = LibraryScanner()
+        self.library_items = []
+        self.library_paths = {}
+        self.library_generation = 0
+        self.library_scanning = False
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self.worker_loop, name=f"trimd-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logging.debug(f"TrimService started with {workers} workers, queue size {max_queue}.")
+
+    def new_record(self, entry):
+        record = {
+            "job": Job(self.journal, entry),
+            "id": entry["id"],
+            "kind": entry["kind"],
+            "url": entry.get("url"),
+            "source": entry.get("source"),
+            "status": "queued",
+            "message": "Queued.",
+            "percent": 0.0,
+            "output": None,
+            "error": None,
+            "created": entry["created"],
+            "finished": None,
+        }
+        with self.lock:
+            self.records[entry["id"]] = record
+        return record
+
+    def submit(self, fields):
+        self.prune()
+        kind = fields.pop("kind")
+        entry = self.journal.create(kind, **fields)
+        if kind == "download":
+            self.journal.update(entry["id"], download_prefix=f"downloaded_video_{entry['id']}")
+        record = self.new_record(entry)
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.lock:
+                del self.records[entry["id"]]
+            self.journal.remove(entry["id"])
+            raise TrimServiceBusy("Job queue is full, try again later.")
+        logging.debug(f"Queued {kind} job {entry['id']}.")
+        return record
+
+    def resume_interrupted(self):
+        # Interrupted jobs were accepted before the restart, so they bypass the queue limit
+        pending = sorted(self.journal.interrupted(), key=lambda e: e["created"])
+        for entry in pending:
+            if entry["kind"] == "trim" and not os.path.exists(entry["source"]):
+                logging.error(f"Source of interrupted job {entry['id']} is gone: {entry['source']}")
+                cleanup_job_files(entry)
+                self.journal.remove(entry["id"])
+                continue
+            self.queue.put(self.new_record(entry))
+        if pending:
+            logging.debug(f"Resumed {len(pending)} interrupted job(s).")
+
+    def prune(self):
+        cutoff = time.time() - RESULT_TTL_SEC
+        with self.lock:
+            for job_id in [i for i, r in self.records.items() if r["finished"] and r["finished"] < cutoff]:
+                del self.records[job_id]
+
+    def url_lock(self, url):
+        with self.lock:
+            return self.url_locks.setdefault(url, threading.Lock())
+
+    def worker_loop(self):
+        while True:
+            record = self.queue.get()
+            try:
+                self.run_record(record)
+            finally:
+                self.queue.task_done()
+
+    def run_record(self, record):
+        job = record["job"]
+        entry = job.entry
+        if entry is None:
+            record.update(status="failed", message="Error: job is missing from the journal.",
+                          error="Job is missing from the journal.", finished=time.time())
+            return
+        # Jobs for the same URL run one at a time so only the first one downloads
+        url = entry.get("url")
+        lock = self.url_lock(url) if entry["kind"] == "download" else contextlib.nullcontext()
+
+        def set_status(text):
+            record["message"] = text
+
+        def set_progress(percent):
+            record["percent"] = percent
+
+        with lock:
+            record["status"] = "running"
+            cached = self.download_cache.get(url)
+            if (entry["kind"] == "download" and entry["stage"] == "queued"
+                    and cached and os.path.exists(cached)):
+                logging.debug(f"Job {job.id} reuses cached download {cached}.")
+                base_name = os.path.splitext(os.path.basename(cached))[0]
+                job.journal.reserve_output(
+                    job.id, clip_filename(base_name, entry["start_sec"], entry["duration_sec"], entry["mode"]))
+                job.update(kind="trim", source=cached)
+                record["percent"] = 100.0
+            try:
+                output_filename = run_job(job, status_callback=set_status, progress_callback=set_progress)
+            except JobCancelled:
+                record.update(status="cancelled", message="Cancelled. Partial files were removed.")
+            except Exception as e:
+                record.update(status="failed", message=f"Error: {e}", error=str(e))
+            else:
+                if url:
+                    self.download_cache[url] = job.final_entry["source"]
+                # Absolute, so clients in another directory can find the downloaded video
+                record.update(status="done", message=f"Success: {output_filename} created!",
+                              output=output_filename, percent=100.0,
+                              source=os.path.abspath(job.final_entry["source"]))
+            record["finished"] = time.time()
+
+    def cancel(self, job_id):
+        record = self.records.get(job_id)
+        if record is None:
+            return None
+        if record["status"] not in TERMINAL_STATUSES:
+            record["job"].cancel()
+            if record["status"] == "queued":
+                record["message"] = "Cancelling..."
+        return record
+
+    def get(self, job_id):
+        return self.records.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return sorted(self.records.values(), key=lambda r: r["created"])
+
+    def refresh_library(self):
+        """Start rescanning the allowed roots unless a scan is already running."""
+        with self.lock:
+            if self.library_scanning:
+                return
+            self.library_scanning = True
+            self.library_generation += 1
+            generation = self.library_generation
+            self.library_items = []
+            self.library_paths = {}
+
+        def on_item(item):
+            with self.lock:
+                if generation == self.library_generation:
+                    self.library_items.append(item)
+                    self.library_paths[item["path"]] = item
+
+        def on_done():
+            with self.lock:
+                self.library_scanning = False
+        self.library.scan(self.allowed_roots, on_item, on_done)
+
+    def library_snapshot(self, since=0):
+        with self.lock:
+            items = self.library_items[since:]
+            return {
+                "generation": self.library_generation,
+                "scanning": self.library_scanning,
+                "items": [{key: value for key, value in item.items() if key != "thumb"} for item in items],
+            }
+
+    def library_thumbnail(self, path):
+        with self.lock:
+            item = self.library_paths.get(path)
+        return item["thumb"] if item else None
+
+    def health(self):
+        probe = self.tool_probe.result or {}
+        return {
+            "tools": probe.get("versions"),
+            "workers": len(self.threads),
+            "queued": self.queue.qsize(),
+            "max_queue": self.queue.maxsize,
+            "cached_downloads": len(self.download_cache),
+            "library_videos": len(self.library_items),
+        }
+
+
+def record_to_json(record):
+    payload = {key: value for key, value in record.items() if key != "job"}
+    payload["output_path"] = os.path.abspath(record["output"]) if record["output"] else None
+    return payload
+
+
+class TrimRequestHandler(BaseHTTPRequestHandler):
+    server_version = "YouTubeTrimmerD/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logging.debug("trimd: " + format % args)
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        # A DNS-rebound page runs with the daemon's own origin and needs no CORS
+        # preflight; the Host header it sends still names the attacker's domain
+        host = (self.headers.get("Host") or "").lower()
+        if host not in self.server.allowed_hosts:
+            self.close_connection = True
+            self.send_error_json(403, "Unexpected Host header.")
+            return False
+        return True
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message, headers=None):
+        self.send_json(status, {"error": message}, headers)
+
+    def path_parts(self):
+        return [part for part in self.path.split("?")[0].split("/") if part]
+
+    def query_param(self, name, default=None):
+        values = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get(name)
+        return values[0] if values else default
+
+    def do_GET(self):
+        parts = self.path_parts()
+        if parts == ["health"]:
+            self.send_json(200, self.service.health())
+        elif parts == ["jobs"]:
+            self.send_json(200, {"jobs": [record_to_json(r) for r in self.service.list()]})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            record = self.service.get(parts[1])
+            if record is None:
+                self.send_error_json(404, "No such job.")
+            else:
+                self.send_json(200, record_to_json(record))
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+            self.send_result(parts[1])
+        elif parts == ["library"]:
+            if self.query_param("refresh"):
+                self.service.refresh_library()
+            try:
+                since = int(self.query_param("since", 0))
+            except ValueError:
+                self.send_error_json(400, "'since' must be an integer.")
+                return
+            self.send_json(200, self.service.library_snapshot(since))
+        elif parts == ["library", "thumbnail"]:
+            self.send_thumbnail(self.query_param("path", ""))
+        else:
+            self.send_error_json(404, "Not found.")
+
+    def send_thumbnail(self, path):
+        # Only thumbnails of scanned library videos are served, never arbitrary files
+        thumb_path = self.service.library_thumbnail(path)
+        try:
+            with open(thumb_path, "rb") as f:
+                data = f.read()
+        except (OSError, TypeError):
+            self.send_error_json(404, "No thumbnail for that video.")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_result(self, job_id):
+        record = self.service.get(job_id)
+        if record is None:
+            self.send_error_json(404, "No such job.")
+            return
+        if record["status"] != "done":
+            self.send_error_json(409, f"Job is {record['status']}, not done.")
+            return
+        try:
+            f = open(record["output"], "rb")
+        except OSError:
+            self.send_error_json(410, "Result file is gone.")
+            return
+        with f:
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(record["output"])}"')
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+    def do_POST(self):
+        if self.path_parts() != ["jobs"]:
+            self.send_error_json(404, "Not found.")
+            return
+        if self.headers.get_content_type() != "application/json":
+            self.send_error_json(415, "Content-Type must be application/json.")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError("Invalid Content-Length.")
+            if length > MAX_BODY_BYTES:
+                self.send_error_json(413, "Request body too large.")
+                return
+            fields = parse_job_params(json.loads(self.rfile.read(length) or b"{}"),
+                                      self.service.allowed_roots)
+        except ValueError as e:
+            self.send_error_json(400, str(e))
+            return
+        try:
+            record = self.service.submit(fields)
+        except TrimServiceBusy as e:
+            self.send_error_json(503, str(e), {"Retry-After": "5"})
+            return
+        self.send_json(202, record_to_json(record), {"Location": f"/jobs/{record['id']}"})
+
+    def do_DELETE(self):
+        parts = self.path_parts()
+        if len(parts) != 2 or parts[0] != "jobs":
+            self.send_error_json(404, "Not found.")
+            return
+        record = self.service.cancel(parts[1])
+        if record is None:
+            self.send_error_json(404, "No such job.")
+        else:
+            self.send_json(202, record_to_json(record))
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None):
+    server = ThreadingHTTPServer((host, port), TrimRequestHandler)
+    server.daemon_threads = True
+    server.service = service or TrimService()
+    port = server.server_address[1]
+    server.allowed_hosts = {f"{name}:{port}" for name in ("127.0.0.1", "localhost", "[::1]", host.lower())}
+    return server
+
+
+class TrimClient:
+    """Minimal client for the trim daemon, used by the GUI in thin-client mode."""
+
+    def __init__(self, base_url, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def open(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            if e.code == 503:
+                raise TrimServiceBusy(message) from e
+            raise TrimServiceError(message) from e
+        except urllib.error.URLError as e:
+            raise TrimServiceError(f"Trim service unreachable: {e.reason}") from e
+
+    def request(self, method, path, payload=None):
+        with self.open(method, path, payload) as response:
+            return json.loads(response.read())
+
+    def submit(self, **params):
+        return self.request("POST", "/jobs", params)
+
+    def status(self, job_id):
+        return self.request("GET", f"/jobs/{job_id}")
+
+    def cancel(self, job_id):
+        return self.request("DELETE", f"/jobs/{job_id}")
+
+    def health(self):
+        return self.request("GET", "/health")
+
+    def library(self, since=0, refresh=False):
+        return self.request("GET", f"/library?since={since}" + ("&refresh=1" if refresh else ""))
+
+    def thumbnail(self, path):
+        try:
+            with self.open("GET", "/library/thumbnail?" + urllib.parse.urlencode({"path": path})) as response:
+                return response.read()
+        except TrimServiceError:
+            return None
+
+    def fetch_result(self, job_id, dest_path):
+        tmp_path = dest_path + ".part"
+        with self.open("GET", f"/jobs/{job_id}/result") as response, open(tmp_path, "wb") as f:
+            shutil.copyfileobj(response, f)
+        os.replace(tmp_path, dest_path)
+        return dest_path
+
+
+class RemoteJob:
+    """A job running in the daemon; cancel() matches the local Job interface."""
+
+    def __init__(self, client, job_id):
+        self.client = client
+        self.id = job_id
+        # Set by run_remote_job() like Job.final_entry, so the GUI can record the video ID
+        self.final_entry = None
+
+    def cancel(self):
+        # Returns at once like Job.cancel(); the HTTP call must not block the Tk thread
+        def worker():
+            try:
+                self.client.cancel(self.id)
+            except (TrimServiceError, TrimServiceBusy):
+                logging.error(f"Failed to cancel remote job {self.id}", exc_info=True)
+        threading.Thread(target=worker, daemon=True).start()
+
+
+class RemoteLibraryScanner:
+    """Drop-in for library.LibraryScanner that lists the daemon's library instead of scanning.
+
+    The daemon does the directory walk, probing and thumbnail generation once for
+    all clients; this only polls for new items and fetches their thumbnails.
+    """
+
+    def __init__(self, client, decode_thumbnails=False, max_workers=4, poll_interval=0.5):
+        self.client = client
+        self.decode_thumbnails = decode_thumbnails
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="remote-library")
+        self.lock = threading.Lock()
+        self.generation = 0
+
+    def scan(self, roots, on_item, on_done=None):
+        # roots are ignored: the daemon scans its own workdir and --library-root folders
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+
+        def poll():
+            futures = []
+            try:
+                snapshot = self.client.library(refresh=True)
+                remote_generation = snapshot["generation"]
+                since = 0
+                # A different generation means another client started a newer scan after ours ended
+                while generation == self.generation and snapshot["generation"] == remote_generation:
+                    for item in snapshot["items"]:
+                        futures.append(self.executor.submit(self.fetch, generation, item, on_item))
+                    since += len(snapshot["items"])
+                    if not snapshot["scanning"]:
+                        break
+                    time.sleep(self.poll_interval)
+                    snapshot = self.client.library(since=since)
+            except (TrimServiceError, TrimServiceBusy):
+                logging.error("Failed to list the trim daemon's library.", exc_info=True)
+            wait(futures)
+            if generation == self.generation and on_done:
+                on_done()
+        threading.Thread(target=poll, daemon=True).start()
+
+    def fetch(self, generation, item, on_item):
+        if generation != self.generation:
+            return
+        item["thumb"] = None
+        if self.decode_thumbnails:
+            data = self.client.thumbnail(item["path"])
+            item["image"] = decode_thumbnail(io.BytesIO(data)) if data else None
+        if generation == self.generation:
+            on_item(item)
+
+
+def run_remote_job(job, status_callback=None, progress_callback=None, poll_interval=0.5):
+    """Poll a daemon job until it ends, then copy the clip here; mirrors jobs.run_job()."""
+    last_message = None
+    while True:
+        record = job.client.status(job.id)
+        if status_callback and record["message"] != last_message:
+            status_callback(record["message"])
+            last_message = record["message"]
+        if progress_callback and record["kind"] == "download":
+            progress_callback(record["percent"])
+        if record["status"] in TERMINAL_STATUSES:
+            break
+        time.sleep(poll_interval)
+    job.final_entry = {"url": record["url"], "source": record["source"]}
+    if record["status"] == "cancelled":
+        raise JobCancelled()
+    if record["status"] == "failed":
+        raise JobError(record["error"])
+    output_filename = os.path.basename(record["output"])
+    # When the daemon shares our working directory the clip is already here
+    if os.path.abspath(output_filename) != record["output_path"]:
+        job.client.fetch_result(job.id, output_filename)
+    return output_filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YouTube Trimmer job daemon")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to bind (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent download/trim jobs")
+    parser.add_argument("--max-queue", type=int, default=16, help="Queued jobs before submissions get 503")
+    parser.add_argument("--workdir", default=".", help="Directory for downloads, clips and the job journal")
+    parser.add_argument("--library-root", action="append", default=[], metavar="DIR",
+                        help="Extra folder local source videos may be trimmed from (repeatable)")
+    args = parser.parse_args()
+    library_roots = [os.path.abspath(root) for root in args.library_root]
+
+    logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+    os.chdir(args.workdir)
+    service = TrimService(workers=args.workers, max_queue=args.max_queue, library_roots=library_roots)
+    service.resume_interrupted()
+    server = make_server(args.host, args.port, service)
+    logging.info(f"Trim daemon listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import os
+import sys
+import random
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from dedupe import (HashIndex, SAMPLE_POSITIONS, MAX_FRAME_DISTANCE, find_duplicates,
+                    pack_signature, hamming, durations_match)
+
+
+def brute_force_groups(items, index):
+    """Reference grouping: compare every pair, no duration ordering or early exit."""
+    signed = [(item, pack_signature(index.get(item))) for item in items]
+    radius = MAX_FRAME_DISTANCE * len(SAMPLE_POSITIONS)
+    parent = list(range(len(signed)))
+
+    def find(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    for i in range(len(signed)):
+        for j in range(i + 1, len(signed)):
+            (a, sig_a), (b, sig_b) = signed[i], signed[j]
+            if durations_match(a["duration"], b["duration"]) and hamming(sig_a, sig_b) <= radius:
+                parent[find(j)] = find(i)
+    groups = {}
+    for i, (item, _) in enumerate(signed):
+        groups.setdefault(find(i), []).append(item["path"])
+    return {frozenset(group) for group in groups.values() if len(group) > 1}
+
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+class FindDuplicatesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.index = HashIndex(os.path.join(self.tmpdir.name, "hashes.json"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_library(self, count, seed):
+        rng = random.Random(seed)
+        items = []
+        for n in range(count):
+            if items and rng.random() < 0.3:
+                # Near-copy of an earlier video: a few flipped bits and a slightly different length
+                original = rng.choice(items)
+                hashes = [flip_bits(h, rng.randint(0, 14), rng) for h in self.index.get(original)]
+                duration = original["duration"] + rng.uniform(-3, 3)
+            else:
+                hashes = [rng.getrandbits(64) for _ in SAMPLE_POSITIONS]
+                # Few distinct lengths, so many unrelated videos fall in the same duration window
+                duration = float(rng.choice((30, 60, 61, 600, 3600)))
+            item = {"path": f"/videos/{n}.mp4", "name": f"{n}.mp4", "size": rng.randint(1, 10**9),
+                    "mtime": 0.0, "duration": duration}
+            self.index.put(item, hashes)
+            items.append(item)
+        return items
+
+    def test_matches_brute_force(self):
+        for seed in range(5):
+            items = self.make_library(400, seed)
+            groups = find_duplicates(items, self.index)
+            self.assertEqual({frozenset(item["path"] for item in group) for group in groups},
+                             brute_force_groups(items, self.index))
+
+    def test_groups_are_sorted_largest_first(self):
+        items = self.make_library(200, 42)
+        for group in find_duplicates(items, self.index):
+            sizes = [item["size"] for item in group]
+            self.assertEqual(sizes, sorted(sizes, reverse=True))
+
+    def test_skips_videos_without_duration(self):
+        items = self.make_library(50, 7)
+        for item in items:
+            item["duration"] = None
+        self.assertEqual(find_duplicates(items, self.index), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
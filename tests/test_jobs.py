@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from jobs import JobJournal, Job, claim_filename, run_job
+
+
+class ClaimFilenameTest(unittest.TestCase):
+    def setUp(self):
+        self.old_cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.tmpdir.cleanup()
+
+    def test_skips_existing_files(self):
+        with open("Title.mp4", "w") as f:
+            f.write("existing")
+        self.assertEqual(claim_filename("Title", ".mp4"), "Title_2.mp4")
+        with open("Title.mp4") as f:
+            self.assertEqual(f.read(), "existing")
+
+    def test_concurrent_claims_get_distinct_names(self):
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            names = list(executor.map(lambda _: claim_filename("Title", ".mp4"), range(50)))
+        self.assertEqual(len(set(names)), 50)
+        self.assertTrue(all(os.path.exists(name) for name in names))
+
+
+class ResumeDownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.old_cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        self.journal = JobJournal()
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.tmpdir.cleanup()
+
+    def interrupted_job(self, **fields):
+        entry = self.journal.create("download", url="https://example.com/v", start_sec=0,
+                                    duration_sec=5, mode="duration", download_prefix="downloaded_video_x",
+                                    **fields)
+        self.journal.update(entry["id"], stage="downloading")
+        return Job(self.journal, self.journal.get(entry["id"]))
+
+    def test_crash_after_rename_skips_the_download(self):
+        with open("Title.mp4", "w") as f:
+            f.write("video")
+        job = self.interrupted_job(downloaded_as="Title.mp4")
+        with mock.patch("jobs.download_stage", side_effect=AssertionError("downloaded again")), \
+                mock.patch("jobs.trim_stage", side_effect=lambda job: job.entry["output"]):
+            output = run_job(job)
+        self.assertEqual(output, "Title_00h00m00s+00h00m05s.mp4")
+        self.assertEqual(job.final_entry["source"], "Title.mp4")
+
+    def test_crash_before_rename_reuses_the_claimed_name(self):
+        open("Title.mp4", "w").close()
+        with open("downloaded_video_x.mp4", "w") as f:
+            f.write("video")
+        job = self.interrupted_job(downloaded_as="Title.mp4")
+        with mock.patch("jobs.download_stage", return_value="downloaded_video_x.mp4"), \
+                mock.patch("jobs.get_video_title", side_effect=AssertionError("name claimed again")), \
+                mock.patch("jobs.trim_stage", side_effect=lambda job: job.entry["output"]):
+            run_job(job)
+        with open("Title.mp4") as f:
+            self.assertEqual(f.read(), "video")
+        self.assertFalse(os.path.exists("downloaded_video_x.mp4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
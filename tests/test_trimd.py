@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""End-to-end tests of the trim daemon on localhost, with stub ffmpeg/ffprobe/yt-dlp on PATH."""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import textwrap
+import threading
+import unittest
+import http.client
+import urllib.error
+import urllib.request
+
+# Point the tool probe and thumbnail caches at a scratch home before they are imported
+SCRATCH = tempfile.mkdtemp(prefix="trimd-test-")
+STUB_BIN = os.path.join(SCRATCH, "bin")
+os.environ["HOME"] = os.path.join(SCRATCH, "home")
+os.environ["XDG_CACHE_HOME"] = os.path.join(SCRATCH, "cache")
+os.environ["PATH"] = STUB_BIN + os.pathsep + os.environ.get("PATH", "")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from trimd import (TrimService, TrimClient, TrimServiceBusy, TrimServiceError, RemoteJob,
+                   make_server, run_remote_job)
+
+# Sources or URLs containing "slow" keep the stub tools busy until they are killed
+STUBS = {
+    "yt-dlp": """\
+        #!/bin/sh
+        case "$1" in
+            --version) echo 2024.01.01; exit 0;;
+            --get-title) echo "Stub Title"; exit 0;;
+        esac
+        prev=
+        for arg; do
+            [ "$prev" = "-o" ] && out=$arg
+            prev=$arg
+            url=$arg
+        done
+        echo "[download]  50.0% of 1.00MiB"
+        case "$url" in *slow*) sleep 30;; esac
+        echo video > "$out"
+        echo "[download] 100.0% of 1.00MiB"
+        """,
+    "ffmpeg": """\
+        #!/bin/sh
+        case "$1" in -version) echo "ffmpeg version 6.0-stub"; exit 0;; -hide_banner) exit 0;; esac
+        for arg; do out=$arg; done
+        case "$*" in *slow*) sleep 30;; esac
+        echo clip > "$out"
+        """,
+    "ffprobe": """\
+        #!/bin/sh
+        case "$1" in -version) echo "ffprobe version 6.0-stub"; exit 0;; esac
+        echo 12.5
+        """,
+}
+
+
+def setUpModule():
+    os.makedirs(STUB_BIN, exist_ok=True)
+    os.makedirs(os.environ["HOME"], exist_ok=True)
+    for name, script in STUBS.items():
+        path = os.path.join(STUB_BIN, name)
+        with open(path, "w") as f:
+            f.write(textwrap.dedent(script))
+        os.chmod(path, 0o755)
+
+def tearDownModule():
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+@unittest.skipIf(os.name == "nt", "stub tools are POSIX shell scripts")
+class TrimDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.old_cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp(dir=SCRATCH)
+        os.chdir(self.workdir)
+        self.service = TrimService(workers=1, max_queue=1)
+        self.server = make_server("127.0.0.1", 0, self.service)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.client = TrimClient(self.base_url)
+
+    def tearDown(self):
+        for record in self.service.list():
+            self.service.cancel(record["id"])
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.old_cwd)
+
+    def make_source(self, name="source.mp4", directory=None):
+        path = os.path.join(directory or self.workdir, name)
+        with open(path, "w") as f:
+            f.write("video\n")
+        return path
+
+    def wait_for(self, job_id, statuses, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            record = self.client.status(job_id)
+            if record["status"] in statuses:
+                return record
+            time.sleep(0.05)
+        self.fail(f"Job {job_id} never reached {statuses}, last status {record['status']}")
+
+    def raw_request(self, method, path, body=b"", headers=None):
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, dict(response.headers), response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, dict(e.headers), e.read()
+
+    def test_trim_submit_poll_result(self):
+        record = self.client.submit(source=self.make_source(), start_sec=1, duration_sec=4, mode="duration")
+        self.assertEqual(record["status"], "queued")
+        done = self.wait_for(record["id"], ("done", "failed"))
+        self.assertEqual(done["status"], "done", done["message"])
+        self.assertEqual(os.path.basename(done["output_path"]), "source_00h00m01s+00h00m04s.mp4")
+        dest = os.path.join(SCRATCH, "fetched.mp4")
+        self.client.fetch_result(record["id"], dest)
+        with open(dest) as f:
+            self.assertEqual(f.read(), "clip\n")
+
+    def test_download_submit_poll_result(self):
+        record = self.client.submit(url="https://example.com/watch?v=abc", start_sec=0, duration_sec=3, mode="end")
+        done = self.wait_for(record["id"], ("done", "failed"))
+        self.assertEqual(done["status"], "done", done["message"])
+        self.assertEqual(os.path.basename(done["output_path"]), "Stub_Title_00h00m00s-00h00m03s.mp4")
+        self.assertEqual(done["source"], os.path.abspath("Stub_Title.mp4"))
+
+    def test_run_remote_job_reports_the_downloaded_video(self):
+        url = "https://example.com/watch?v=abc"
+        record = self.client.submit(url=url, start_sec=0, duration_sec=3)
+        job = RemoteJob(self.client, record["id"])
+        output = run_remote_job(job, poll_interval=0.05)
+        self.assertEqual(output, "Stub_Title_00h00m00s+00h00m03s.mp4")
+        self.assertEqual(job.final_entry, {"url": url, "source": os.path.abspath("Stub_Title.mp4")})
+
+    def test_full_queue_returns_503(self):
+        running = self.client.submit(url="https://example.com/slow1", duration_sec=3)
+        self.wait_for(running["id"], ("running",))
+        # The single worker is busy, so this one fills the queue of size one
+        self.client.submit(url="https://example.com/slow2", duration_sec=3)
+        with self.assertRaises(TrimServiceBusy):
+            self.client.submit(url="https://example.com/slow3", duration_sec=3)
+        status, headers, _ = self.raw_request(
+            "POST", "/jobs", json.dumps({"url": "https://example.com/slow4", "duration_sec": 3}).encode(),
+            {"Content-Type": "application/json"})
+        self.assertEqual(status, 503)
+        self.assertEqual(headers.get("Retry-After"), "5")
+
+    def test_non_json_post_returns_415(self):
+        body = json.dumps({"url": "https://example.com/v", "duration_sec": 3}).encode()
+        status, _, _ = self.raw_request("POST", "/jobs", body, {"Content-Type": "text/plain"})
+        self.assertEqual(status, 415)
+        self.assertEqual(self.service.list(), [])
+
+    def test_source_outside_allowed_roots_is_rejected(self):
+        outside = tempfile.mkdtemp(dir=SCRATCH)
+        with self.assertRaises(TrimServiceError):
+            self.client.submit(source=self.make_source(directory=outside), duration_sec=3)
+        self.assertEqual(self.service.list(), [])
+
+    def test_invalid_bodies_return_400(self):
+        for payload in ({"source": 123, "duration_sec": 3},
+                        {"url": "file:///etc/passwd", "duration_sec": 3},
+                        {"url": "https://example.com/v", "duration_sec": -1}):
+            status, _, _ = self.raw_request("POST", "/jobs", json.dumps(payload).encode(),
+                                            {"Content-Type": "application/json"})
+            self.assertEqual(status, 400, payload)
+
+    def test_negative_content_length_returns_400(self):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+        connection.putrequest("POST", "/jobs")
+        connection.putheader("Content-Type", "application/json")
+        connection.putheader("Content-Length", "-1")
+        connection.endheaders()
+        self.assertEqual(connection.getresponse().status, 400)
+        connection.close()
+
+    def test_foreign_host_header_returns_403(self):
+        status, _, _ = self.raw_request("GET", "/health", None, {"Host": "attacker.example"})
+        self.assertEqual(status, 403)
+        status, _, _ = self.raw_request("GET", "/health", None,
+                                        {"Host": f"localhost:{self.server.server_address[1]}"})
+        self.assertEqual(status, 200)
+
+    def test_cancel_running_job_removes_partial_files(self):
+        record = self.client.submit(url="https://example.com/slow", duration_sec=3)
+        self.wait_for(record["id"], ("running",))
+        self.client.cancel(record["id"])
+        cancelled = self.wait_for(record["id"], ("cancelled", "done", "failed"))
+        self.assertEqual(cancelled["status"], "cancelled")
+        self.assertEqual([name for name in os.listdir(".") if name.startswith("downloaded_video_")], [])
+
+    def test_cancel_unknown_job_returns_404(self):
+        with self.assertRaises(TrimServiceError):
+            self.client.cancel("nosuchjob")
+
+
+if __name__ == "__main__":
+    unittest.main()